@@ -1,24 +1,32 @@
-from flask import Flask, render_template, redirect, url_for, request,flash
+from flask import Flask, render_template, redirect, url_for, request,flash,abort
 from flask_bootstrap import Bootstrap5
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, String, Float,ForeignKey,DateTime
+from sqlalchemy import Integer, String, Float,ForeignKey,DateTime,Index,select,update,delete,or_,case
 from sqlalchemy.orm import relationship
+from sqlalchemy.engine import Engine
+from sqlalchemy import event
 from sqlalchemy.sql import func
 from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField
 from wtforms.fields.simple import TextAreaField
 from wtforms.validators import DataRequired
 import requests
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, time, timedelta
 from supermemo import SuperMemo2
 import os
 
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get("FLASK_KEY")
+# The due-today cache lives in process memory and is only invalidated in the process that made the change.
+# The Procfile pins gunicorn to one worker (--workers 1, concurrency comes from --threads) so it stays correct;
+# turn it off (DUE_CACHE=0) wherever several processes serve the same database (e.g. Vercel, or more workers)
+app.config['DUE_CACHE_ENABLED'] = os.environ.get("DUE_CACHE", "1") != "0"
 Bootstrap5(app)
 sm2 = SuperMemo2()
 
@@ -29,6 +37,24 @@ sm2 = SuperMemo2()
 class Base(DeclarativeBase):
     pass
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL", "sqlite:///subjects.db")
+# Check connections before use so a stale pooled connection doesn't fail the request
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith("sqlite"):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(pool_size=10, max_overflow=20)
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a write is in progress; synchronous=NORMAL is the recommended pairing for WAL.
+    # SQLite only enforces foreign keys (and so ON DELETE CASCADE) when asked to, per connection.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+
 # Create the extension
 db = SQLAlchemy(model_class=Base)
 # Initialise the app with the extension
@@ -42,26 +68,32 @@ class Subject(db.Model):
     Subs: Mapped[str] = mapped_column(String(250), unique=True)
 
     # Define relationship to access children
-    chapters = relationship("Chapter", back_populates="subject", cascade = "all, delete-orphan")
+    # passive_deletes: delete_subject bulk-deletes the children itself, so the ORM doesn't load them first
+    chapters = relationship("Chapter", back_populates="subject", cascade = "all, delete-orphan", passive_deletes=True)
 
 
 class Chapter(db.Model):
     __tablename__ = "chapters"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    parent_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("subjects.id"))
+    parent_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("subjects.id", ondelete="CASCADE"), index=True)
     Chapters: Mapped[str] = mapped_column(String(250), unique=True)
 
     # Define relationship to access parent
     subject = relationship("Subject", back_populates="chapters")
 
     # Define relationship to access parent chapter
-    questions = relationship("QuesAns", back_populates="chapter",cascade = "all, delete-orphan")
+    # passive_deletes: delete_chapter bulk-deletes the questions itself, so the ORM doesn't load them first
+    questions = relationship("QuesAns", back_populates="chapter",cascade = "all, delete-orphan", passive_deletes=True)
 
 
 class QuesAns(db.Model):
     __tablename__ = "quesans"
+    # Serves the study deck's "due in this chapter" lookup: WHERE chapter_id = ? ... ORDER BY RecallDate.
+    # Its chapter_id prefix also covers plain chapter_id lookups, so no separate index is needed.
+    __table_args__ = (Index("ix_quesans_chapter_recall", "chapter_id", "RecallDate"),)
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    chapter_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("chapters.id"))
+    chapter_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("chapters.id", ondelete="CASCADE"))
     Question: Mapped[str] = mapped_column(String(500))
     Answer: Mapped[str] = mapped_column(String(1000))
 
@@ -81,6 +113,8 @@ class QuesAns(db.Model):
     chapter = relationship("Chapter", back_populates="questions")
 
 
+# Builds a new database with the latest schema; an existing one keeps its tables as they are,
+# so `flask db upgrade` is how it picks up schema changes (stamp it first, see migrations/README)
 with app.app_context():
     db.create_all()
 
@@ -113,63 +147,128 @@ class EditQuesAnsForm(FlaskForm):
     submit = SubmitField(label = "Done")
 #-----------------------------------------------------FORMS----------------------------------------------------
 # -----------------------------------------------------HELPER FUNCTIONS-----------------------------------------
-def has_questions_due_today(entity):
+# Due-today id sets, kept until the date changes or a route adds, grades or deletes questions.
+# Each entry records the generation it was computed under; invalidating bumps the generation,
+# so a set computed from data read before a concurrent commit is never stored or served.
+due_cache = {}
+due_cache_lock = threading.Lock()
+due_cache_generation = 0
+
+def invalidate_due_cache():
     """
-    Checks if a Subject or Chapter has any questions due for review today
-    based on the SuperMemo2 algorithm's determination.
+    Drops every cached due-today set. Call after each commit that can change which questions are due.
     """
-    today = datetime.now().date()
-
-    chapters_to_check = []
-    if isinstance(entity, Subject):
-        chapters_to_check = entity.chapters
-    elif isinstance(entity, Chapter):
-        chapters_to_check = [entity]
-    else:
-        return False # Invalid entity type
+    global due_cache_generation
+    with due_cache_lock:
+        due_cache_generation += 1
+        due_cache.clear()
 
-    for chapter in chapters_to_check:
-        # Accessing `chapter.questions` loads all questions for this chapter.
-        # This might trigger a DB query if not already loaded by a join.
-        all_questions_in_chapter = chapter.questions
+def get_cached_due_ids(key, compute):
+    """
+    Returns the cached id set for `key` if it was computed today under the current generation,
+    otherwise recomputes it and stores it unless the cache was invalidated in the meantime.
+    """
+    if not app.config['DUE_CACHE_ENABLED']:
+        return compute()
 
-        # Use the sm2 method to determine actual study questions for today
-        # limit=None ensures all due questions are considered
-        questions_for_study = sm2.get_chapter_questions_for_study(all_questions_in_chapter, limit=None)
+    today = datetime.now().date()
+    with due_cache_lock:
+        generation = due_cache_generation
+        cached = due_cache.get(key)
+    if cached is not None and cached[0] == today and cached[1] == generation:
+        return cached[2]
+
+    due_ids = compute()
+    with due_cache_lock:
+        if generation == due_cache_generation:
+            due_cache[key] = (today, generation, due_ids)
+    return due_ids
+
+def due_today_filter():
+    """
+    SQL condition matching questions that are due for review today:
+    new questions (no RecallDate) and questions whose RecallDate falls on or before today.
+    """
+    start_of_tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), time.min)
+    return or_(QuesAns.RecallDate.is_(None), QuesAns.RecallDate < start_of_tomorrow)
 
-        # If there are any questions returned by sm2.get_chapter_questions_for_study,
-        # it means there's something due for review.
-        if len(questions_for_study) > 0:
-            return True
-    return False
+def get_due_subject_ids():
+    """
+    Returns the set of Subject ids that have at least one question due today,
+    computed with a single query instead of walking every chapter's questions.
+    """
+    query = (
+        select(Chapter.parent_id)
+        .join(QuesAns, QuesAns.chapter_id == Chapter.id)
+        .where(due_today_filter())
+        .distinct()
+    )
+    return set(db.session.execute(query).scalars())
+
+def get_due_chapter_ids(subject_id):
+    """
+    Returns the set of Chapter ids (within the given subject) that have at least one question due today.
+    """
+    query = (
+        select(QuesAns.chapter_id)
+        .join(Chapter, Chapter.id == QuesAns.chapter_id)
+        .where(Chapter.parent_id == subject_id, due_today_filter())
+        .distinct()
+    )
+    return set(db.session.execute(query).scalars())
+
+def get_chapter_with_subject(chapter_id):
+    """
+    Fetches a Chapter together with its parent Subject in one query, or aborts with 404.
+    """
+    query = (
+        select(Chapter, Subject)
+        .join(Subject, Subject.id == Chapter.parent_id)
+        .where(Chapter.id == chapter_id)
+    )
+    row = db.session.execute(query).one_or_none()
+    if row is None:
+        abort(404)
+    return row.Chapter, row.Subject
+
+def get_chapter_study_statistics(chapter_id):
+    """
+    Computes the study deck statistics for a chapter with a single aggregate query,
+    without loading the chapter's questions.
+    """
+    query = select(
+        func.count(QuesAns.id),
+        func.sum(case((due_today_filter(), 1), else_=0)),
+        func.count(QuesAns.RevisedDate),
+        func.avg(case((QuesAns.RevisedDate.is_not(None), QuesAns.EasinessFactor))),
+    ).where(QuesAns.chapter_id == chapter_id)
+    total, due, studied, average_easiness = db.session.execute(query).one()
+    return sm2.build_study_statistics(total, due or 0, studied, average_easiness)
 
 # -----------------------------------------------------HELPER FUNCTIONS-----------------------------------------
 
 
 @app.route("/")
 def home():
-    with app.app_context():
-        result = db.session.execute(db.select(Subject))
-        all_subs = result.scalars().all()
+    due_subject_ids = get_cached_due_ids("subjects", get_due_subject_ids)
 
-        # Augment each subject with a flag indicating if it has due questions
-        subjects_with_due_status = []
-        for subject in all_subs:
-            # Check if this subject or any of its chapters has questions due today
-            subject.has_due_questions = has_questions_due_today(subject)
-            subjects_with_due_status.append(subject)
+    # Augment each subject with a flag indicating if it has due questions
+    subjects_with_due_status = []
+    for subject in db.session.scalars(select(Subject)):
+        # Check if any of this subject's chapters has questions due today
+        subject.has_due_questions = subject.id in due_subject_ids
+        subjects_with_due_status.append(subject)
 
     return render_template('index.html', sub_list=subjects_with_due_status)
 
 @app.route("/<subject_name>/<int:id>") # Changed variable name to subject_name to avoid conflict
 def view_chapters(id, subject_name):
-    # Fetch chapters related to the subject
-    chapters = Chapter.query.filter_by(parent_id=id).all()
+    due_chapter_ids = get_cached_due_ids(("chapters", id), lambda: get_due_chapter_ids(id))
 
-    # Augment each chapter with a flag indicating if it has due questions
+    # Fetch chapters related to the subject and augment each with a flag indicating if it has due questions
     chapters_with_due_status = []
-    for chapter in chapters:
-        chapter.has_due_questions = has_questions_due_today(chapter)
+    for chapter in db.session.scalars(select(Chapter).where(Chapter.parent_id == id)):
+        chapter.has_due_questions = chapter.id in due_chapter_ids
         chapters_with_due_status.append(chapter)
 
     return render_template('view_chapters.html', chapters=chapters_with_due_status, parent_id=id, subject_name=subject_name)
@@ -180,24 +279,25 @@ def add_subject():
     if form.validate_on_submit():
         sub = form.subject.data
         new_subject = Subject(Subs=sub)
-        with app.app_context():
-            db.session.add(new_subject)
-            db.session.commit()
+        db.session.add(new_subject)
+        db.session.commit()
         return redirect(url_for("home"))
     return render_template("add_subject.html",form = form)
 
 
 @app.route('/delete-subject/<int:id>', methods=["POST"])
 def delete_subject(id):
-    subject = Subject.query.get_or_404(id)
+    subject = db.get_or_404(Subject, id)
 
     try:
-        # With cascade="all, delete-orphan" on the Subject->Chapter relationship,
-        # deleting the subject will automatically trigger the deletion of its chapters.
-        # And because Chapter->QuesAns also has cascade="all, delete-orphan",
-        # the questions will be deleted when their parent chapters are deleted.
+        # Delete the subject's questions and chapters with one statement each instead of loading them.
+        # This doesn't rely on ON DELETE CASCADE, so it also works on databases that predate that migration.
+        chapter_ids = select(Chapter.id).where(Chapter.parent_id == id)
+        db.session.execute(delete(QuesAns).where(QuesAns.chapter_id.in_(chapter_ids)))
+        db.session.execute(delete(Chapter).where(Chapter.parent_id == id))
         db.session.delete(subject)
         db.session.commit()
+        invalidate_due_cache()
         flash(f'Subject "{subject.Subs}" and all its chapters/questions deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -209,10 +309,9 @@ def delete_subject(id):
 def edit_subject(id):
     form = EditSubForm()
     if form.validate_on_submit():
-        with app.app_context():
-            subject = Subject.query.get_or_404(id)
-            subject.Subs = form.subject.data
-            db.session.commit()
+        subject = db.get_or_404(Subject, id)
+        subject.Subs = form.subject.data
+        db.session.commit()
         return redirect(url_for('home'))
     return render_template("edit_subject.html",form = form,id = id)
 
@@ -220,7 +319,7 @@ def edit_subject(id):
 @app.route('/add_chapter/<subject_id>', methods=["POST", "GET"])
 def add_chapter(subject_id):
     form = AddChapterForm()
-    subject = Subject.query.get_or_404(subject_id) # Handles subject not found
+    subject = db.get_or_404(Subject, subject_id) # Handles subject not found
     subject_name = subject.Subs
 
     if form.validate_on_submit():
@@ -230,9 +329,8 @@ def add_chapter(subject_id):
             parent_id=subject.id
         )
         try:
-            with app.app_context():
-                db.session.add(new_chapter)
-                db.session.commit()
+            db.session.add(new_chapter)
+            db.session.commit()
             flash(f'Chapter "{chapter_name}" added successfully to "{subject_name}"!', 'success')
             return redirect(url_for("view_chapters", id=subject_id, subject_name=subject_name))
         except Exception as e:
@@ -248,15 +346,21 @@ def add_chapter(subject_id):
 
 @app.route('/delete_chapter/<int:id>',methods = ['POST'])
 def delete_chapter(id):
-    chapter = Chapter.query.get_or_404(id)
-    subject_id = chapter.parent_id  # Store for redirect
-    subject = Subject.query.get_or_404(subject_id)
+    chapter, subject = get_chapter_with_subject(id)
+    subject_id = subject.id  # Store for redirect
     subject_name = subject.Subs
-    QuesAns.query.filter_by(chapter_id=id).delete()
-    db.session.delete(chapter)
-    db.session.commit()
 
-    flash('Chapter deleted successfully!', 'success')
+    try:
+        # Delete the chapter's questions with one statement instead of loading them
+        db.session.execute(delete(QuesAns).where(QuesAns.chapter_id == id))
+        db.session.delete(chapter)
+        db.session.commit()
+        invalidate_due_cache()
+        flash('Chapter deleted successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting chapter: {e}', 'error')
+        print(f"Error deleting chapter: {e}")
 
     # Redirect back to the appropriate chapters view
     return redirect(url_for('view_chapters', id=subject_id,subject_name = subject_name))
@@ -265,24 +369,20 @@ def delete_chapter(id):
 def edit_chapter(id):
     form = EditChapterForm()
     if form.validate_on_submit():
-        with app.app_context():
-            chapter = Chapter.query.get_or_404(id)
-            chapter.Chapters = form.chapter.data
-            subject_id = chapter.parent_id  # Store for redirect
-            subject = Subject.query.get_or_404(subject_id)
-            subject_name = subject.Subs
-            db.session.commit()
+        chapter, subject = get_chapter_with_subject(id)
+        chapter.Chapters = form.chapter.data
+        subject_id = subject.id  # Store for redirect
+        subject_name = subject.Subs
+        db.session.commit()
         return redirect(url_for('view_chapters', id=subject_id,subject_name = subject_name))
     return render_template("edit_chapter.html",form = form,id = id)
 
 @app.route('/view_deck/<int:chapter_id>')
 def view_deck(chapter_id):
-    chapter = Chapter.query.get_or_404(chapter_id)
+    chapter, subject = get_chapter_with_subject(chapter_id)
 
     questions = QuesAns.query.filter_by(chapter_id = chapter_id).all()
 
-    subject = Subject.query.get_or_404(chapter.parent_id)
-
     return render_template("view_deck.html",chapter=chapter,questions= questions,subject=subject)
 
 
@@ -290,7 +390,7 @@ def view_deck(chapter_id):
 @app.route('/add_question/<int:chapter_id>', methods=['GET', 'POST'])
 def add_question(chapter_id):
     # Get the chapter to ensure it exists
-    chapter = Chapter.query.get_or_404(chapter_id)
+    chapter = db.get_or_404(Chapter, chapter_id)
 
     # Create form instance
     form = AddQuesAnsForm()
@@ -307,6 +407,7 @@ def add_question(chapter_id):
             # Add to database
             db.session.add(new_question)
             db.session.commit()
+            invalidate_due_cache()
 
             # Flash success message
             flash('Question added successfully!', 'success')
@@ -323,18 +424,21 @@ def add_question(chapter_id):
 
 @app.route('/delete_question/<int:question_id>',methods = ["POST","GET"])
 def delete_question(question_id):
-    question = QuesAns.query.get_or_404(question_id)
-    chapter_id = question.chapter_id
+    # Only the chapter id is needed for the redirect, so don't load the whole question
+    chapter_id = db.session.scalar(select(QuesAns.chapter_id).where(QuesAns.id == question_id))
+    if chapter_id is None:
+        abort(404)
 
-    db.session.delete(question)
+    db.session.execute(delete(QuesAns).where(QuesAns.id == question_id))
     db.session.commit()
+    invalidate_due_cache()
 
     flash('Question deleted successfully!', 'success')
     return redirect(url_for('view_deck', chapter_id=chapter_id))
 
 @app.route('/edit_question/<int:question_id>',methods = ["POST","GET"])
 def edit_question(question_id):
-    question = QuesAns.query.get_or_404(question_id)
+    question = db.get_or_404(QuesAns, question_id)
 
     form = EditQuesAnsForm()
 
@@ -365,30 +469,34 @@ def submit_study_deck(chapter_id):
                 print(f"Warning: Could not parse form data for key {key}, value {value}")
                 continue
 
-    # Get the actual question objects
+    # Get the current scheduling values of the submitted questions
     question_ids = list(question_grades.keys())
 
     # IMPORTANT: Fetch only the questions that were submitted, within the chapter.
     # This prevents malicious users from submitting grades for questions outside their chapter.
-    questions = QuesAns.query.filter(
-        QuesAns.id.in_(question_ids),
-        QuesAns.chapter_id == chapter_id  # Added chapter_id filter for security
+    questions = db.session.execute(
+        select(QuesAns.id, QuesAns.EasinessFactor, QuesAns.Repetitions, QuesAns.Interval).where(
+            QuesAns.id.in_(question_ids),
+            QuesAns.chapter_id == chapter_id  # Added chapter_id filter for security
+        )
     ).all()
 
-    # Update using algorithm (modifies the objects in-place)
+    # Calculate the new values using the algorithm
     result = sm2.update_questions_batch(questions, question_grades)
 
     if result['success']:
+        # Apply all updates with one bulk UPDATE by primary key
+        if result['updates']:
+            db.session.execute(update(QuesAns), result['updates'])
         db.session.commit()  # YOU handle the database commit
+        invalidate_due_cache()
         # --- ADDED: Flash message and redirect for user feedback ---
-        from flask import flash, redirect, url_for
         flash(result.get('message', 'Study session completed successfully!'), 'success')
         # Redirect back to the study deck for the same chapter
         return redirect(url_for('study_deck', chapter_id=chapter_id))
     else:
         db.session.rollback()
         # --- ADDED: Flash message and redirect for user feedback ---
-        from flask import flash, redirect, url_for
         error_message = result.get('message', 'An error occurred during study session.')
         if result.get('errors'):
             error_message += " Errors: " + ", ".join(result['errors'])
@@ -400,33 +508,42 @@ def submit_study_deck(chapter_id):
 @app.route('/study_deck/<int:chapter_id>')
 def study_deck(chapter_id):
 
-    all_questions = QuesAns.query.filter_by(chapter_id=chapter_id).all()
-    chapter = Chapter.query.get_or_404(chapter_id)
+    chapter = db.get_or_404(Chapter, chapter_id)
     chapter_name = chapter.Chapters
 
-    # Pass the list to the algorithm
-    study_questions = sm2.get_chapter_questions_for_study(all_questions, limit=200)
-    stats = sm2.get_study_statistics(all_questions)
-
-    # --- ADDED: Prepare questions for the template with is_new and days_until_review ---
-    from datetime import datetime, timedelta
-
-    processed_study_questions = []
-    for q in study_questions:
-        q.is_new = (q.RevisedDate is None)
-        if q.RecallDate:
-            q.days_until_review = (q.RecallDate.date() - datetime.now().date()).days
-        else:
-            q.days_until_review = 0  # Or some other default for new questions to not show as overdue
-        processed_study_questions.append(q)
+    # Let the database pick the due questions: new ones first, then the most overdue.
+    # Only the columns the deck shows are selected, as plain rows rather than QuesAns objects.
+    study_query = (
+        select(QuesAns.id, QuesAns.Question, QuesAns.Answer, QuesAns.RecallDate, QuesAns.RevisedDate)
+        .where(QuesAns.chapter_id == chapter_id, due_today_filter())
+        .order_by(QuesAns.RecallDate.nulls_first(), QuesAns.id)
+        .limit(200)
+    )
+    study_questions = db.session.execute(study_query)
+    stats = get_chapter_study_statistics(chapter_id)
+
+    # --- ADDED: Prepare (question, is_new, days_until_review) rows for the template ---
+    today = datetime.now().date()
+
+    # New questions get 0 days so they don't show as overdue
+    processed_study_questions = [
+        (q, q.RevisedDate is None, (q.RecallDate.date() - today).days if q.RecallDate else 0)
+        for q in study_questions
+    ]
     # ----------------------------------------------------------------------------------
 
     return render_template('study_deck.html',
-                           questions=processed_study_questions,  # Pass the processed list
+                           questions=processed_study_questions,  # Pass the processed rows
                            stats=stats,
                            chapter_id=chapter_id,
                            chapter_name = chapter_name
                            )  # Ensure chapter_id is passed for the form action and title
 
 if __name__ == '__main__':
+    # In development, log any lazy loads that turn into N+1 queries (optional dependency)
+    try:
+        from nplusone.ext.flask_sqlalchemy import NPlusOne
+        NPlusOne(app)
+    except ImportError:
+        pass
     app.run(debug=True)
@@ -0,0 +1,74 @@
+"""due indexes
+
+Adds the indexes behind the due-today and study deck queries and recreates the
+chapters.parent_id and quesans.chapter_id foreign keys with ON DELETE CASCADE.
+
+Databases built by db.create_all() need a one-time `flask db stamp` before
+upgrading; see migrations/README.
+
+Revision ID: cfc8cfa86754
+Revises: f28f38d37c60
+Create Date: 2026-10-15 05:03:43.246065
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cfc8cfa86754'
+down_revision = 'f28f38d37c60'
+branch_labels = None
+depends_on = None
+
+# SQLite foreign keys created by create_all() are unnamed; batch mode reflects them under this name
+naming_convention = {"fk": "fk_%(table_name)s_%(column_0_name)s"}
+
+
+def foreign_key_name(table, column):
+    # Postgres reports the real name (e.g. quesans_chapter_id_fkey); fall back to the naming convention
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column] and foreign_key['name']:
+            return foreign_key['name']
+    return f"fk_{table}_{column}"
+
+
+def recreate_foreign_keys(ondelete):
+    # SQLite rebuilds each table in batch mode; with foreign keys enforced, dropping the old
+    # chapters table would delete (or cascade to) the questions that reference it.
+    # The pragma is ignored inside a transaction, hence the autocommit blocks.
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys=OFF")
+
+    for table, column, referred_table in (('chapters', 'parent_id', 'subjects'),
+                                          ('quesans', 'chapter_id', 'chapters')):
+        name = foreign_key_name(table, column)
+        with op.batch_alter_table(table, schema=None, naming_convention=naming_convention) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(f"fk_{table}_{column}", referred_table, [column], ['id'], ondelete=ondelete)
+
+    if sqlite:
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys=ON")
+
+
+def upgrade():
+    with op.batch_alter_table('chapters', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chapters_parent_id'), ['parent_id'], unique=False)
+
+    with op.batch_alter_table('quesans', schema=None) as batch_op:
+        batch_op.create_index('ix_quesans_chapter_recall', ['chapter_id', 'RecallDate'], unique=False)
+
+    recreate_foreign_keys(ondelete='CASCADE')
+
+
+def downgrade():
+    recreate_foreign_keys(ondelete=None)
+
+    with op.batch_alter_table('quesans', schema=None) as batch_op:
+        batch_op.drop_index('ix_quesans_chapter_recall')
+
+    with op.batch_alter_table('chapters', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chapters_parent_id'))
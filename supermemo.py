@@ -1,7 +1,100 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batches fall back to the per-question path
+    np = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; very large batches fall back to the NumPy path
+    njit = None
+
+DEFAULT_EASINESS = 2.5
+DEFAULT_REPETITIONS = 0
+DEFAULT_INTERVAL = 1
+MIN_EASINESS = 1.3
+
+
+def sm2_step(easiness_factor: float, repetitions: int, interval: int, grade: int,
+             min_easiness: float = MIN_EASINESS) -> Tuple[float, int, int]:
+    """
+    One SuperMemo 2 step on plain values: no validation, defaults or dates
+
+    Args:
+        easiness_factor: Current easiness factor
+        repetitions: Current repetition count
+        interval: Current interval in days
+        grade: User's recall grade (1-5)
+        min_easiness: Lower bound for the easiness factor
+
+    Returns:
+        Tuple (new easiness factor (not rounded), new repetitions, new interval)
+    """
+    # Step 1: Update easiness factor based on grade
+    # Formula: EF' = EF + (0.1 - (5-q) * (0.08 + (5-q) * 0.02))
+    q = 5 - grade
+    new_easiness_factor = easiness_factor + (0.1 - q * (0.08 + q * 0.02))
+    if new_easiness_factor < min_easiness:
+        new_easiness_factor = min_easiness
+
+    # Step 2: Determine new interval based on grade
+    if grade < 3:
+        # Poor recall (grade 1 or 2) - restart the sequence
+        return new_easiness_factor, 0, 1
+
+    # Good recall (grade 3, 4, or 5) - continue the sequence
+    repetitions += 1
+    if repetitions == 1:
+        return new_easiness_factor, 1, 1
+    if repetitions == 2:
+        return new_easiness_factor, 2, 6
+    # For repetitions > 2: I(n) = I(n-1) * EF
+    return new_easiness_factor, repetitions, round(interval * new_easiness_factor)
+
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def sm2_batch_kernel(easiness_factor, repetitions, interval, grade, min_easiness):
+        """
+        Compiled SuperMemo 2 step over arrays, same formulas as sm2_step (requires Numba)
+
+        Library-only: calculate_batch uses it for batches of at least JIT_MIN_BATCH questions,
+        which the app never sends (a study deck form is capped at 1000 fields by Werkzeug).
+        It is meant for scripts that reschedule many questions at once.
+
+        Returns:
+            Tuple of arrays (new easiness factors (not rounded), new repetitions, new intervals)
+        """
+        n = grade.shape[0]
+        new_easiness_factor = np.empty(n, dtype=np.float64)
+        new_repetitions = np.empty(n, dtype=np.int64)
+        new_interval = np.empty(n, dtype=np.int64)
+
+        for i in prange(n):
+            q = 5 - grade[i]
+            ef = easiness_factor[i] + (0.1 - q * (0.08 + q * 0.02))
+            if ef < min_easiness:
+                ef = min_easiness
+            new_easiness_factor[i] = ef
+
+            if grade[i] < 3:
+                new_repetitions[i] = 0
+                new_interval[i] = 1
+            else:
+                reps = repetitions[i] + 1
+                new_repetitions[i] = reps
+                if reps == 1:
+                    new_interval[i] = 1
+                elif reps == 2:
+                    new_interval[i] = 6
+                else:
+                    new_interval[i] = np.int64(np.rint(interval[i] * ef))
+
+        return new_easiness_factor, new_repetitions, new_interval
+
 
 class SuperMemo2:
     """
@@ -10,10 +103,14 @@ class SuperMemo2:
     """
 
     def __init__(self):
-        self.DEFAULT_EASINESS = 2.5
-        self.DEFAULT_REPETITIONS = 0
-        self.DEFAULT_INTERVAL = 1
-        self.MIN_EASINESS = 1.3
+        self.DEFAULT_EASINESS = DEFAULT_EASINESS
+        self.DEFAULT_REPETITIONS = DEFAULT_REPETITIONS
+        self.DEFAULT_INTERVAL = DEFAULT_INTERVAL
+        self.MIN_EASINESS = MIN_EASINESS
+        # Below this many graded questions the per-question path is faster than NumPy
+        self.VECTORIZE_MIN_BATCH = 50
+        # Below this, NumPy beats Numba's compile/thread startup; only library callers send batches this large
+        self.JIT_MIN_BATCH = 10_000
 
     def calculate_next_revision(self, question: 'QuesAns', grade: int) -> Dict[str, Any]:
         """
@@ -29,39 +126,17 @@ class SuperMemo2:
         if not (1 <= grade <= 5):
             raise ValueError("Grade must be between 1 and 5")
 
-        # Get current values or defaults for new questions
-        easiness_factor = question.EasinessFactor or self.DEFAULT_EASINESS
-        repetitions = question.Repetitions or self.DEFAULT_REPETITIONS
-        interval = question.Interval or self.DEFAULT_INTERVAL
-
         current_date = datetime.now()
 
-        # SuperMemo 2 Algorithm Implementation
-
-        # Step 1: Update easiness factor based on grade
-        # Formula: EF' = EF + (0.1 - (5-q) * (0.08 + (5-q) * 0.02))
-        new_easiness_factor = max(
-            self.MIN_EASINESS,
-            easiness_factor + (0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        # SuperMemo 2 Algorithm Implementation, using defaults for new questions
+        new_easiness_factor, new_repetitions, new_interval = sm2_step(
+            question.EasinessFactor or self.DEFAULT_EASINESS,
+            question.Repetitions or self.DEFAULT_REPETITIONS,
+            question.Interval or self.DEFAULT_INTERVAL,
+            grade,
+            self.MIN_EASINESS
         )
 
-        # Step 2: Determine new interval based on grade
-        if grade < 3:
-            # Poor recall (grade 1 or 2) - restart the sequence
-            new_repetitions = 0
-            new_interval = 1
-        else:
-            # Good recall (grade 3, 4, or 5) - continue the sequence
-            new_repetitions = repetitions + 1
-
-            if new_repetitions == 1:
-                new_interval = 1
-            elif new_repetitions == 2:
-                new_interval = 6
-            else:
-                # For repetitions > 2: I(n) = I(n-1) * EF
-                new_interval = round(interval * new_easiness_factor)
-
         # Step 3: Calculate next recall date
         next_recall_date = current_date + timedelta(days=new_interval)
 
@@ -74,6 +149,81 @@ class SuperMemo2:
             'LastGrade': grade
         }
 
+    def calculate_batch(self, easiness_factor: 'np.ndarray', repetitions: 'np.ndarray',
+                        interval: 'np.ndarray', grade: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """
+        Vectorized SuperMemo 2 step for many questions at once (requires NumPy)
+
+        Same formulas as calculate_next_revision, applied element-wise. Grades must
+        already be validated and missing values replaced by the defaults. Batches of
+        at least JIT_MIN_BATCH questions use the compiled Numba kernel when available.
+
+        Args:
+            easiness_factor: Current easiness factors (float)
+            repetitions: Current repetition counts (int)
+            interval: Current intervals in days (int)
+            grade: Recall grades (1-5)
+
+        Returns:
+            Tuple of arrays (new easiness factors, new repetitions, new intervals);
+            easiness factors are not rounded
+        """
+        if njit is not None and len(grade) >= self.JIT_MIN_BATCH:
+            return sm2_batch_kernel(
+                np.ascontiguousarray(easiness_factor, dtype=np.float64),
+                np.ascontiguousarray(repetitions, dtype=np.int64),
+                np.ascontiguousarray(interval, dtype=np.int64),
+                np.ascontiguousarray(grade, dtype=np.int64),
+                self.MIN_EASINESS
+            )
+
+        q = 5 - grade
+        new_easiness_factor = np.maximum(self.MIN_EASINESS, easiness_factor + (0.1 - q * (0.08 + q * 0.02)))
+
+        poor = grade < 3
+        new_repetitions = np.where(poor, 0, repetitions + 1)
+        new_interval = np.where(
+            poor | (new_repetitions == 1), 1,
+            np.where(new_repetitions == 2, 6, np.rint(interval * new_easiness_factor).astype(np.int64))
+        )
+
+        return new_easiness_factor, new_repetitions, new_interval
+
+    def calculate_next_revisions(self, questions: List['QuesAns'], grades: List[int]) -> List[Dict[str, Any]]:
+        """
+        Calculate the next revision for many questions with the vectorized kernel (requires NumPy)
+
+        Args:
+            questions: List of QuesAns objects (or rows with EasinessFactor, Repetitions and Interval)
+            grades: Recall grade (1-5) for each question, in the same order
+
+        Returns:
+            List of dictionaries with updated values, as returned by calculate_next_revision
+        """
+        easiness_factor = np.array([q.EasinessFactor or self.DEFAULT_EASINESS for q in questions], dtype=np.float64)
+        repetitions = np.array([q.Repetitions or self.DEFAULT_REPETITIONS for q in questions], dtype=np.int64)
+        interval = np.array([q.Interval or self.DEFAULT_INTERVAL for q in questions], dtype=np.int64)
+        grade = np.array(grades, dtype=np.int64)
+
+        new_easiness_factor, new_repetitions, new_interval = self.calculate_batch(
+            easiness_factor, repetitions, interval, grade
+        )
+
+        current_date = datetime.now()
+
+        return [
+            {
+                'RevisedDate': current_date,
+                'RecallDate': current_date + timedelta(days=days),
+                'EasinessFactor': round(ef, 2),
+                'Repetitions': reps,
+                'Interval': days,
+                'LastGrade': g
+            }
+            for ef, reps, days, g in zip(new_easiness_factor.tolist(), new_repetitions.tolist(),
+                                         new_interval.tolist(), grade.tolist())
+        ]
+
     def update_question_after_review(self, db_session: Session, question: 'QuesAns', grade: int):
         """
         Update a question in the database after review
@@ -139,7 +289,37 @@ class SuperMemo2:
         Returns:
             Dictionary with study statistics
         """
-        if not questions:
+        due_questions = self.get_due_questions(questions)
+        studied_questions = [q for q in questions if q.RevisedDate is not None]
+
+        # Calculate average easiness factor
+        if studied_questions:
+            avg_easiness = sum(q.EasinessFactor for q in studied_questions) / len(studied_questions)
+        else:
+            avg_easiness = None
+
+        return self.build_study_statistics(
+            total=len(questions),
+            due=len(due_questions),
+            studied=len(studied_questions),
+            average_easiness=avg_easiness
+        )
+
+    def build_study_statistics(self, total: int, due: int, studied: int, average_easiness: float = None) -> Dict[str, Any]:
+        """
+        Build the study statistics dictionary from pre-computed counts,
+        e.g. the result of a single SQL aggregate over a chapter
+
+        Args:
+            total: Number of questions
+            due: Number of questions due for review today (including new ones)
+            studied: Number of questions reviewed at least once
+            average_easiness: Average easiness factor of the studied questions (None if none studied)
+
+        Returns:
+            Dictionary with study statistics
+        """
+        if not total:
             return {
                 'total_questions': 0,
                 'due_today': 0,
@@ -149,23 +329,16 @@ class SuperMemo2:
                 'completion_rate': 0
             }
 
-        due_questions = self.get_due_questions(questions)
-        new_questions = self.get_new_questions(questions)
-        studied_questions = [q for q in questions if q.RevisedDate is not None]
-
-        # Calculate average easiness factor
-        if studied_questions:
-            avg_easiness = sum(q.EasinessFactor for q in studied_questions) / len(studied_questions)
-        else:
-            avg_easiness = self.DEFAULT_EASINESS
+        if average_easiness is None:
+            average_easiness = self.DEFAULT_EASINESS
 
         return {
-            'total_questions': len(questions),
-            'due_today': len(due_questions),
-            'new_questions': len(new_questions),
-            'studied_questions': len(studied_questions),
-            'average_easiness_factor': round(avg_easiness, 2),
-            'completion_rate': round((len(studied_questions) / len(questions)) * 100, 1) if questions else 0
+            'total_questions': total,
+            'due_today': due,
+            'new_questions': total - studied,
+            'studied_questions': studied,
+            'average_easiness_factor': round(average_easiness, 2),
+            'completion_rate': round((studied / total) * 100, 1)
         }
 
     def get_next_review_batch(self, questions: List['QuesAns'], batch_size: int = 10) -> List['QuesAns']:
@@ -191,10 +364,15 @@ class SuperMemo2:
 
     def update_questions_batch(self, questions: List['QuesAns'], question_grades: Dict[int, int]) -> Dict[str, Any]:
         """
-        Update multiple questions at once after batch review
+        Calculate the updates for multiple questions at once after batch review
+
+        The questions are not modified: the new values are returned under 'updates'
+        as one dictionary per question (keyed by 'id'), ready for a single bulk
+        UPDATE, e.g. db_session.execute(update(QuesAns), result['updates'])
 
         Args:
-            questions: List of QuesAns objects
+            questions: List of QuesAns objects, or rows with id, EasinessFactor,
+                       Repetitions and Interval
             question_grades: Dictionary mapping question_id to grade (1-5)
                            e.g., {1: 4, 2: 3, 3: 5}
 
@@ -207,30 +385,43 @@ class SuperMemo2:
         # Create a lookup dictionary for questions by ID
         question_lookup = {q.id: q for q in questions}
 
+        updates = []
         updated_questions = []
         errors = []
 
         try:
-            # Process each question in the batch
+            # Validate grades and resolve the questions first
+            to_review = []
             for question_id, grade in question_grades.items():
-                try:
-                    # Validate grade
-                    if not (1 <= grade <= 5):
-                        errors.append(f"Question {question_id}: Invalid grade {grade}")
-                        continue
-
-                    # Get the question from the list
-                    question = question_lookup.get(question_id)
-                    if not question:
-                        errors.append(f"Question {question_id}: Not found in provided list")
-                        continue
+                if not (1 <= grade <= 5):
+                    errors.append(f"Question {question_id}: Invalid grade {grade}")
+                    continue
+
+                # Get the question from the list
+                question = question_lookup.get(question_id)
+                if not question:
+                    errors.append(f"Question {question_id}: Not found in provided list")
+                    continue
+
+                to_review.append((question_id, question, grade))
+
+            # Calculate new values using SuperMemo 2, vectorized for large batches
+            revisions = None
+            if np is not None and len(to_review) >= self.VECTORIZE_MIN_BATCH:
+                revisions = self.calculate_next_revisions(
+                    [question for _, question, _ in to_review],
+                    [grade for _, _, grade in to_review]
+                )
 
-                    # Calculate new values using SuperMemo 2
-                    update_data = self.calculate_next_revision(question, grade)
+            # Process each question in the batch
+            for index, (question_id, question, grade) in enumerate(to_review):
+                try:
+                    if revisions is not None:
+                        update_data = revisions[index]
+                    else:
+                        update_data = self.calculate_next_revision(question, grade)
 
-                    # Update the question object
-                    for key, value in update_data.items():
-                        setattr(question, key, value)
+                    updates.append({'id': question_id, **update_data})
 
                     updated_questions.append({
                         'id': question_id,
@@ -246,6 +437,7 @@ class SuperMemo2:
                 'success': True,
                 'updated_count': len(updated_questions),
                 'updated_questions': updated_questions,
+                'updates': updates,
                 'errors': errors,
                 'message': f"Successfully updated {len(updated_questions)} questions"
             }
@@ -0,0 +1,76 @@
+"""
+Shared setup for the test modules: points the app at a throwaway SQLite database
+(before main.py is imported, since it reads DATABASE_URL at import time) and
+gives each test a clean schema.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+
+os.environ["DATABASE_URL"] = "sqlite:///" + DB_PATH
+os.environ.setdefault("FLASK_KEY", "test-key")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+from main import app, db  # noqa: E402
+
+app.config["TESTING"] = True
+app.config["WTF_CSRF_ENABLED"] = False
+# The templates sit next to main.py in this tree rather than in templates/
+app.template_folder = ROOT
+
+
+# The schema as create_all() built it before the due indexes and ON DELETE CASCADE foreign keys,
+# i.e. what existing deployments have until they run the migrations
+BASELINE_SCHEMA = [
+    """CREATE TABLE subjects (
+        id INTEGER NOT NULL,
+        "Subs" VARCHAR(250) NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE ("Subs")
+    )""",
+    """CREATE TABLE chapters (
+        id INTEGER NOT NULL,
+        parent_id INTEGER NOT NULL,
+        "Chapters" VARCHAR(250) NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(parent_id) REFERENCES subjects (id),
+        UNIQUE ("Chapters")
+    )""",
+    """CREATE TABLE quesans (
+        id INTEGER NOT NULL,
+        chapter_id INTEGER NOT NULL,
+        "Question" VARCHAR(500) NOT NULL,
+        "Answer" VARCHAR(1000) NOT NULL,
+        "RevisedDate" DATETIME,
+        "RecallDate" DATETIME,
+        "EasinessFactor" FLOAT DEFAULT '2.5' NOT NULL,
+        "Repetitions" INTEGER DEFAULT '0' NOT NULL,
+        "Interval" INTEGER DEFAULT '1' NOT NULL,
+        "LastGrade" INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(chapter_id) REFERENCES chapters (id)
+    )""",
+]
+
+
+def reset_database(baseline_schema=False):
+    """
+    Drops every table and recreates them, either from the current models or
+    with BASELINE_SCHEMA, and empties the due-today cache.
+    """
+    with app.app_context():
+        db.drop_all()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+            if baseline_schema:
+                for statement in BASELINE_SCHEMA:
+                    connection.exec_driver_sql(statement)
+        if not baseline_schema:
+            db.create_all()
+    main.invalidate_due_cache()
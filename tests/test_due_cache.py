@@ -0,0 +1,46 @@
+import unittest
+
+from support import app, reset_database
+import main
+
+
+class DueCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        reset_database()
+        self.calls = 0
+
+    def tearDown(self):
+        app.config['DUE_CACHE_ENABLED'] = True
+
+    def compute(self):
+        self.calls += 1
+        return {self.calls}
+
+    def test_caches_until_invalidated(self):
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {1})
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {1})
+
+        main.invalidate_due_cache()
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {2})
+
+    def test_does_not_store_a_set_computed_across_an_invalidation(self):
+        # A concurrent request commits and invalidates while this one is still computing
+        def compute_during_commit():
+            due_ids = self.compute()
+            main.invalidate_due_cache()
+            return due_ids
+
+        self.assertEqual(main.get_cached_due_ids("subjects", compute_during_commit), {1})
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {2})
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {2})
+
+    def test_disabled_cache_always_recomputes(self):
+        app.config['DUE_CACHE_ENABLED'] = False
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {1})
+        self.assertEqual(main.get_cached_due_ids("subjects", self.compute), {2})
+        self.assertEqual(main.due_cache, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
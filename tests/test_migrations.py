@@ -0,0 +1,98 @@
+import os
+import unittest
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, stamp, upgrade
+from sqlalchemy import inspect, text
+
+from support import ROOT, app, db, reset_database
+
+MIGRATIONS = os.path.join(ROOT, "migrations")
+INITIAL_REVISION = "f28f38d37c60"
+
+
+class MigrationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # A database created by create_all() before the due indexes, with data in it
+        reset_database(baseline_schema=True)
+        with app.app_context(), db.engine.begin() as connection:
+            connection.execute(text("INSERT INTO subjects (id, \"Subs\") VALUES (1, 'Math'), (2, 'Bio')"))
+            connection.execute(text("INSERT INTO chapters (id, parent_id, \"Chapters\") VALUES (1, 1, 'Algebra'), (2, 2, 'Cells')"))
+            connection.execute(text(
+                "INSERT INTO quesans (id, chapter_id, \"Question\", \"Answer\") "
+                "VALUES (1, 1, 'q1', 'a'), (2, 1, 'q2', 'a'), (3, 2, 'q3', 'a')"
+            ))
+
+    def tearDown(self):
+        reset_database()
+
+    def count(self, table):
+        with app.app_context(), db.engine.connect() as connection:
+            return connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+    def foreign_keys(self, table):
+        with app.app_context():
+            return {
+                fk['constrained_columns'][0]: fk['options'].get('ondelete')
+                for fk in inspect(db.engine).get_foreign_keys(table)
+            }
+
+    def index_names(self, table):
+        with app.app_context():
+            return {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+    def upgrade_existing_database(self):
+        with app.app_context():
+            stamp(directory=MIGRATIONS, revision=INITIAL_REVISION)
+            upgrade(directory=MIGRATIONS)
+
+    def test_upgrade_adds_indexes_and_cascading_foreign_keys(self):
+        self.upgrade_existing_database()
+
+        self.assertIn("ix_chapters_parent_id", self.index_names("chapters"))
+        self.assertIn("ix_quesans_chapter_recall", self.index_names("quesans"))
+        self.assertEqual(self.foreign_keys("chapters"), {"parent_id": "CASCADE"})
+        self.assertEqual(self.foreign_keys("quesans"), {"chapter_id": "CASCADE"})
+
+        # Rebuilding the tables keeps every row
+        self.assertEqual((self.count("subjects"), self.count("chapters"), self.count("quesans")), (2, 2, 3))
+
+    def test_upgraded_database_cascades_deletes(self):
+        self.upgrade_existing_database()
+
+        with app.app_context(), db.engine.begin() as connection:
+            connection.execute(text("DELETE FROM subjects WHERE id = 1"))
+
+        self.assertEqual((self.count("subjects"), self.count("chapters"), self.count("quesans")), (1, 1, 1))
+
+    def test_downgrade_restores_plain_foreign_keys(self):
+        self.upgrade_existing_database()
+        with app.app_context():
+            downgrade(directory=MIGRATIONS, revision=INITIAL_REVISION)
+
+        self.assertNotIn("ix_quesans_chapter_recall", self.index_names("quesans"))
+        self.assertEqual(self.foreign_keys("quesans"), {"chapter_id": None})
+        self.assertEqual(self.count("quesans"), 3)
+
+    def test_new_database_only_needs_stamping(self):
+        reset_database()
+        with app.app_context():
+            stamp(directory=MIGRATIONS, revision="head")
+            upgrade(directory=MIGRATIONS)
+
+        self.assertEqual(self.foreign_keys("quesans"), {"chapter_id": "CASCADE"})
+
+    def test_migrations_match_the_models(self):
+        with app.app_context():
+            db.drop_all()
+            upgrade(directory=MIGRATIONS)
+            with db.engine.connect() as connection:
+                differences = compare_metadata(MigrationContext.configure(connection), db.metadata)
+
+        self.assertEqual(differences, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from support import app, db, reset_database
+from main import Subject, Chapter, QuesAns, get_chapter_study_statistics
+
+
+class RouteTestCase(unittest.TestCase):
+    baseline_schema = False
+
+    def setUp(self):
+        reset_database(self.baseline_schema)
+        self.client = app.test_client()
+
+        now = datetime.now()
+        with app.app_context():
+            math = Subject(Subs="Math")
+            bio = Subject(Subs="Bio")
+            db.session.add_all([math, bio])
+            db.session.flush()
+
+            algebra = Chapter(Chapters="Algebra", parent_id=math.id)
+            cells = Chapter(Chapters="Cells", parent_id=bio.id)
+            db.session.add_all([algebra, cells])
+            db.session.flush()
+
+            db.session.add_all([
+                # Algebra: one new, two overdue (5 days and 1 day), one not due yet
+                QuesAns(Question="new", Answer="a", chapter_id=algebra.id),
+                QuesAns(Question="overdue-1", Answer="a", chapter_id=algebra.id,
+                        RevisedDate=now - timedelta(days=7), RecallDate=now - timedelta(days=1),
+                        EasinessFactor=2.2, Repetitions=3, Interval=6),
+                QuesAns(Question="overdue-5", Answer="a", chapter_id=algebra.id,
+                        RevisedDate=now - timedelta(days=9), RecallDate=now - timedelta(days=5),
+                        EasinessFactor=2.6, Repetitions=2, Interval=6),
+                QuesAns(Question="later", Answer="a", chapter_id=algebra.id,
+                        RevisedDate=now, RecallDate=now + timedelta(days=3),
+                        EasinessFactor=2.5, Repetitions=1, Interval=1),
+                # Cells: nothing due
+                QuesAns(Question="cells-later", Answer="a", chapter_id=cells.id,
+                        RevisedDate=now, RecallDate=now + timedelta(days=3),
+                        EasinessFactor=2.5, Repetitions=1, Interval=1),
+            ])
+            db.session.commit()
+            self.math_id, self.bio_id = math.id, bio.id
+            self.algebra_id, self.cells_id = algebra.id, cells.id
+            self.question_ids = {q.Question: q.id for q in QuesAns.query.all()}
+
+    def count(self, model, **filters):
+        with app.app_context():
+            return model.query.filter_by(**filters).count()
+
+    def get_question(self, name):
+        with app.app_context():
+            return db.session.get(QuesAns, self.question_ids[name])
+
+    @contextmanager
+    def recorded_statements(self):
+        """
+        Collects the verb (SELECT, DELETE, ...) of each SQL statement run inside the block (connection pragmas aren't included).
+        """
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split()[0])
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    def flashes(self):
+        with self.client.session_transaction() as session:
+            return session.get("_flashes", [])
+
+    # ----------------------------------------------- subjects -----------------------------------------------
+    def test_home_flags_subjects_with_due_questions(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertEqual(html.count('class="due-indicator"'), 1)
+        self.assertRegex(html, r'Math\s*<span class="due-indicator"')
+
+    def test_add_subject(self):
+        self.assertEqual(self.client.get("/add").status_code, 200)
+        response = self.client.post("/add", data={"subject": "Chemistry"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(Subject, Subs="Chemistry"), 1)
+
+    def test_edit_subject(self):
+        self.assertEqual(self.client.get(f"/edit_subject/{self.math_id}").status_code, 200)
+        response = self.client.post(f"/edit_subject/{self.math_id}", data={"subject": "Maths"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(Subject, Subs="Maths"), 1)
+
+    def test_delete_subject_removes_its_chapters_and_questions(self):
+        response = self.client.post(f"/delete-subject/{self.math_id}")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.flashes()[0][0], "success")
+        self.assertEqual(self.count(Subject, id=self.math_id), 0)
+        self.assertEqual(self.count(Chapter, parent_id=self.math_id), 0)
+        self.assertEqual(self.count(QuesAns, chapter_id=self.algebra_id), 0)
+        # The other subject is untouched
+        self.assertEqual(self.count(QuesAns, chapter_id=self.cells_id), 1)
+
+    def test_delete_subject_does_not_load_its_chapters_or_questions(self):
+        with self.recorded_statements() as statements:
+            self.client.post(f"/delete-subject/{self.math_id}")
+        # Load the subject, then one DELETE each for its questions, its chapters and the subject
+        self.assertEqual(statements, ["SELECT", "DELETE", "DELETE", "DELETE"])
+
+    # ----------------------------------------------- chapters -----------------------------------------------
+    def test_view_chapters_flags_chapters_with_due_questions(self):
+        response = self.client.get(f"/Math/{self.math_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(as_text=True).count('class="due-indicator"'), 1)
+
+        response = self.client.get(f"/Bio/{self.bio_id}")
+        self.assertNotIn('class="due-indicator"', response.get_data(as_text=True))
+
+    def test_add_chapter(self):
+        self.assertEqual(self.client.get(f"/add_chapter/{self.math_id}").status_code, 200)
+        response = self.client.post(f"/add_chapter/{self.math_id}", data={"chapter": "Geometry"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(Chapter, Chapters="Geometry", parent_id=self.math_id), 1)
+
+    def test_edit_chapter(self):
+        self.assertEqual(self.client.get(f"/edit_chapter/{self.algebra_id}").status_code, 200)
+        response = self.client.post(f"/edit_chapter/{self.algebra_id}", data={"chapter": "Linear Algebra"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(Chapter, Chapters="Linear Algebra"), 1)
+        self.assertEqual(self.client.post("/edit_chapter/999", data={"chapter": "x"}).status_code, 404)
+
+    def test_delete_chapter_removes_its_questions(self):
+        response = self.client.post(f"/delete_chapter/{self.algebra_id}")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(Chapter, id=self.algebra_id), 0)
+        self.assertEqual(self.count(QuesAns, chapter_id=self.algebra_id), 0)
+        self.assertEqual(self.count(QuesAns, chapter_id=self.cells_id), 1)
+        self.assertEqual(self.client.post("/delete_chapter/999").status_code, 404)
+
+    def test_delete_chapter_does_not_load_its_questions(self):
+        with self.recorded_statements() as statements:
+            self.client.post(f"/delete_chapter/{self.algebra_id}")
+        # Load the chapter with its subject, then one DELETE for its questions and one for the chapter
+        self.assertEqual(statements, ["SELECT", "DELETE", "DELETE"])
+
+    # ----------------------------------------------- questions ----------------------------------------------
+    def test_view_deck(self):
+        response = self.client.get(f"/view_deck/{self.algebra_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("overdue-5", response.get_data(as_text=True))
+        self.assertEqual(self.client.get("/view_deck/999").status_code, 404)
+
+    def test_add_question(self):
+        self.assertEqual(self.client.get(f"/add_question/{self.cells_id}").status_code, 200)
+        response = self.client.post(f"/add_question/{self.cells_id}", data={"question": "Q", "answer": "A"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(QuesAns, chapter_id=self.cells_id), 2)
+        # The new question is due, so Bio now shows up as due
+        self.assertIn('class="due-indicator"', self.client.get(f"/Bio/{self.bio_id}").get_data(as_text=True))
+
+    def test_edit_question(self):
+        question_id = self.question_ids["new"]
+        self.assertEqual(self.client.get(f"/edit_question/{question_id}").status_code, 200)
+        response = self.client.post(f"/edit_question/{question_id}", data={"question": "Q2", "answer": "A2"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_question("new").Question, "Q2")
+
+    def test_delete_question(self):
+        response = self.client.post(f"/delete_question/{self.question_ids['new']}")
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(self.get_question("new"))
+        self.assertEqual(self.client.post("/delete_question/999").status_code, 404)
+
+    # ----------------------------------------------- studying -----------------------------------------------
+    def test_study_deck_lists_due_questions_new_first_then_most_overdue(self):
+        response = self.client.get(f"/study_deck/{self.algebra_id}")
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        positions = [html.index(f">{name}<") for name in ("new", "overdue-5", "overdue-1")]
+        self.assertEqual(positions, sorted(positions))
+        self.assertNotIn(">later<", html)
+        self.assertEqual(html.count('status-new">NEW'), 1)
+        self.assertEqual(html.count('status-overdue">OVERDUE'), 2)
+
+    def test_study_deck_statistics(self):
+        with app.app_context():
+            stats = get_chapter_study_statistics(self.algebra_id)
+        self.assertEqual(stats, {
+            'total_questions': 4,
+            'due_today': 3,
+            'new_questions': 1,
+            'studied_questions': 3,
+            'average_easiness_factor': 2.43,
+            'completion_rate': 75.0
+        })
+        self.assertEqual(self.client.get("/study_deck/999").status_code, 404)
+
+    def test_submit_study_deck_updates_graded_questions(self):
+        response = self.client.post(f"/submit_study_deck/{self.algebra_id}", data={
+            f"question_{self.question_ids['new']}": "5",
+            f"question_{self.question_ids['overdue-5']}": "4",
+            f"question_{self.question_ids['overdue-1']}": "1",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.flashes()[0][0], "success")
+
+        new = self.get_question("new")
+        self.assertEqual((new.Repetitions, new.Interval, new.EasinessFactor, new.LastGrade), (1, 1, 2.6, 5))
+        self.assertEqual((new.RecallDate - new.RevisedDate).days, 1)
+
+        overdue_5 = self.get_question("overdue-5")
+        self.assertEqual((overdue_5.Repetitions, overdue_5.Interval, overdue_5.EasinessFactor), (3, 16, 2.6))
+
+        overdue_1 = self.get_question("overdue-1")
+        self.assertEqual((overdue_1.Repetitions, overdue_1.Interval, overdue_1.LastGrade), (0, 1, 1))
+
+        # Nothing left due in Algebra, so Math loses its badge
+        self.assertNotIn('class="due-indicator"', self.client.get("/").get_data(as_text=True))
+
+    def test_submit_study_deck_skips_invalid_grades_and_other_chapters(self):
+        response = self.client.post(f"/submit_study_deck/{self.algebra_id}", data={
+            f"question_{self.question_ids['new']}": "9",
+            f"question_{self.question_ids['cells-later']}": "5",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.flashes(), [("success", "Successfully updated 0 questions")])
+        self.assertIsNone(self.get_question("new").RevisedDate)
+        self.assertEqual(self.get_question("cells-later").Repetitions, 1)
+
+    def test_submit_study_deck_handles_malformed_grades(self):
+        response = self.client.post(f"/submit_study_deck/{self.algebra_id}", data={
+            f"question_{self.question_ids['new']}": "\u00b2",  # passes str.isdigit() but not int()
+            f"question_{self.question_ids['overdue-5']}": "-1",
+            f"question_{self.question_ids['overdue-1']}": " 4",
+            "question_abc": "3",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.flashes(), [("success", "Successfully updated 1 questions")])
+        self.assertIsNone(self.get_question("new").LastGrade)
+        self.assertEqual(self.get_question("overdue-5").Repetitions, 2)
+        self.assertEqual(self.get_question("overdue-1").LastGrade, 4)
+
+
+class BaselineSchemaRouteTestCase(RouteTestCase):
+    """
+    Runs every route test against a database created before the ON DELETE CASCADE
+    foreign keys, so deletes must not rely on the database to remove the children.
+    """
+    baseline_schema = True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+import support  # noqa: F401  (puts the repo root on sys.path)
+import supermemo
+from supermemo import SuperMemo2
+
+
+def random_questions(count, seed=0):
+    """
+    Rows with random scheduling values, including the None/0 values new and legacy questions have.
+    """
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(
+            id=question_id,
+            EasinessFactor=rng.choice([None, 0, round(rng.uniform(1.3, 3.5), 2)]),
+            Repetitions=rng.choice([None, 0, 1, 2, rng.randint(3, 30)]),
+            Interval=rng.choice([None, 0, 1, 6, rng.randint(1, 400)]),
+        )
+        for question_id in range(1, count + 1)
+    ]
+
+
+def scheduling_values(revision):
+    return (revision['EasinessFactor'], revision['Repetitions'], revision['Interval'], revision['LastGrade'],
+            (revision['RecallDate'] - revision['RevisedDate']).days)
+
+
+@unittest.skipIf(supermemo.np is None, "NumPy is not installed")
+class VectorizedSuperMemo2TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sm2 = SuperMemo2()
+
+    def test_calculate_next_revisions_matches_calculate_next_revision(self):
+        questions = random_questions(5000)
+        rng = random.Random(1)
+        grades = [rng.randint(1, 5) for _ in questions]
+
+        revisions = self.sm2.calculate_next_revisions(questions, grades)
+
+        self.assertEqual(
+            [scheduling_values(revision) for revision in revisions],
+            [scheduling_values(self.sm2.calculate_next_revision(q, g)) for q, g in zip(questions, grades)]
+        )
+
+    def test_both_paths_use_the_instance_settings(self):
+        self.sm2.MIN_EASINESS = 2.0
+        self.sm2.DEFAULT_EASINESS = 2.1
+        self.sm2.DEFAULT_INTERVAL = 3
+        questions = random_questions(500)
+        grades = [1 + question.id % 5 for question in questions]
+
+        revisions = self.sm2.calculate_next_revisions(questions, grades)
+        expected = [self.sm2.calculate_next_revision(q, g) for q, g in zip(questions, grades)]
+
+        self.assertEqual([scheduling_values(r) for r in revisions], [scheduling_values(r) for r in expected])
+        self.assertEqual(min(revision['EasinessFactor'] for revision in expected), 2.0)
+
+    def test_update_questions_batch_vectorizes_large_batches_with_the_same_results(self):
+        questions = random_questions(self.sm2.VECTORIZE_MIN_BATCH + 10)
+        rng = random.Random(2)
+        grades = {q.id: rng.randint(1, 5) for q in questions}
+        grades[questions[0].id] = 9
+
+        per_question = SuperMemo2()
+        per_question.VECTORIZE_MIN_BATCH = len(questions) + 1
+
+        result = self.sm2.update_questions_batch(questions, grades)
+        expected = per_question.update_questions_batch(questions, grades)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['updated_count'], len(questions) - 1)
+        self.assertEqual(result['errors'], [f"Question {questions[0].id}: Invalid grade 9"])
+        self.assertEqual(
+            [(update['id'], scheduling_values(update)) for update in result['updates']],
+            [(update['id'], scheduling_values(update)) for update in expected['updates']]
+        )
+
+
+@unittest.skipIf(supermemo.njit is None, "Numba is not installed")
+class CompiledSuperMemo2TestCase(unittest.TestCase):
+
+    def test_kernel_matches_the_numpy_path(self):
+        np = supermemo.np
+        rng = np.random.default_rng(0)
+        size = 20_000
+        easiness_factor = np.round(rng.uniform(1.3, 3.5, size), 2)
+        repetitions = rng.integers(0, 30, size)
+        interval = rng.integers(1, 400, size)
+        grade = rng.integers(1, 6, size)
+
+        numpy_only = SuperMemo2()
+        numpy_only.JIT_MIN_BATCH = size + 1
+        expected = numpy_only.calculate_batch(easiness_factor, repetitions, interval, grade)
+        compiled = supermemo.sm2_batch_kernel(easiness_factor, repetitions, interval, grade, supermemo.MIN_EASINESS)
+
+        for compiled_values, expected_values in zip(compiled, expected):
+            np.testing.assert_array_equal(compiled_values, expected_values)
+
+
+if __name__ == '__main__':
+    unittest.main()